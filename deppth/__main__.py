@@ -1,4 +1,4 @@
 """__main__: executed when deppth directory is called as a script."""
 
-from .deppth import main
+from .cli import main
 main()
\ No newline at end of file
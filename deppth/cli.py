@@ -2,7 +2,8 @@
 import os
 import argparse
 
-from .deppth import list_contents, pack, patch, extract
+# The deppth module (and the image/compression modules it pulls in) is imported inside
+# each command, so that e.g. --help doesn't pay for importing it.
 
 def main():
   parser = argparse.ArgumentParser(prog='deppth', description='Decompress, Extract, Pack for Pyre, Transistor, and Hades')
@@ -20,6 +21,8 @@ def main():
   extract_parser.add_argument('-t', '--target', metavar='target', default='', help='Where to extract the package')
   extract_parser.add_argument('-e', '--entries', nargs='*', metavar='entry', help='One or more entry names to extract')
   extract_parser.add_argument('-s', '--subtextures', action='store_true', default=False, help='Export subtextures instead of full atlases')
+  extract_parser.add_argument('-f', '--subtexture-format', metavar='format', default='png', choices=['png', 'raw', 'npy'], help='File format for subtextures: png (default), raw (uncompressed RGBA pixels) or npy (numpy arrays, requires numpy)')
+  extract_parser.add_argument('-l', '--level', metavar='level', default=None, type=int, choices=range(0, 10), help='PNG compression level from 0 to 9; lower is faster, 9 produces the smallest files. The default favours speed')
   extract_parser.set_defaults(func=cli_extract)
 
   # Pack parser
@@ -27,6 +30,7 @@ def main():
   pack_parser.add_argument('-s', '--source', metavar='source', default='', type=str, help='Path to the folder to pack, default is current folder')
   pack_parser.add_argument('-t', '--target', metavar='target', default='', help='Path of output file')
   pack_parser.add_argument('-e', '--entries', nargs='*', metavar='entry', help='Only pack entries matching these patterns')
+  pack_parser.add_argument('-l', '--level', metavar='level', default=0, type=int, choices=range(0, 13), help='Compression level; 0 (default) is fastest, 1-12 are slower but produce smaller packages')
   pack_parser.set_defaults(func=cli_pack)
 
   # Patch parser
@@ -39,28 +43,39 @@ def main():
   args.func(args)
 
 def cli_list(args):
+  from .deppth import list_contents
+
   path = args.path
   patterns = args.patterns
 
   list_contents(path, *patterns, logger=lambda s: print(s))
 
 def cli_extract(args):
+  from .deppth import extract
+
   source = args.source
   target = args.target
   entries = args.entries or []
   subtextures = args.subtextures
+  subtexture_format = args.subtexture_format
+  level = args.level
 
-  extract(source, target, *entries, subtextures=subtextures)
+  extract(source, target, *entries, subtextures=subtextures, subtexture_format=subtexture_format, compress_level=level)
 
 def cli_pack(args):
+  from .deppth import pack
+
   curdir = os.getcwd()
   source = os.path.join(curdir, args.source)
   target = args.target
   entries = args.entries or []
+  level = args.level
 
-  pack(source, target, *entries, logger=lambda s: print(s))
+  pack(source, target, *entries, compressor_level=level, logger=lambda s: print(s))
 
 def cli_patch(args):
+  from .deppth import patch
+
   package = args.package
   patches = args.patches
   patch(package, *patches, logger=lambda s : print(s))
\ No newline at end of file
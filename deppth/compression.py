@@ -9,6 +9,12 @@ except ImportError: pass
 
 _chunk_processors = {}              # Stores a mapping of possible chunk processors by byte code
 _chunk_processors_by_name = {}      # Stores a mapping of possible chunk processors by name
+_chunk_processor_aliases = {        # Extra names for chunk processors, mapped to the name and default level they stand for
+  'lz4hc': ('lz4', 9)               # LZ4 high compression: same on-disk format as lz4, smaller but slower to write
+}
+
+_COMPRESSED_FLAG = b'\x01'          # Flag byte at the start of a compressed chunk
+_UNCOMPRESSED_FLAG = b'\x00'        # Flag byte at the start of a chunk stored uncompressed in a compressed package
 
 def chunkprocessor(typeName, typeCode):
   """Decorates a subclass of ChunkProcessorBase to register its name and byte code.
@@ -18,24 +24,24 @@ def chunkprocessor(typeName, typeCode):
   the stream.
   """
   def decorate_entry(cls):
-    def class_wrapper(*args):
-      return cls(*args)
     if typeCode:
-      _chunk_processors[typeCode] = class_wrapper
-      _chunk_processors_by_name[typeName] = class_wrapper
-      class_wrapper._typeCode = typeCode
+      _chunk_processors[typeCode] = cls
+      _chunk_processors_by_name[typeName] = cls
       cls._typeCode = typeCode
-    return class_wrapper
+    return cls
   return decorate_entry
 
 def validate_compressor_name(name):
-  return name in _chunk_processors_by_name
+  return name in _chunk_processors_by_name or name in _chunk_processor_aliases
 
-def get_chunkprocessor_by_name(name):
-  return _chunk_processors_by_name[name]()
+def get_chunkprocessor_by_name(name, level=0):
+  if name in _chunk_processor_aliases:
+    name, default_level = _chunk_processor_aliases[name]
+    level = level or default_level
+  return _chunk_processors_by_name[name](level=level)
 
-def get_chunkprocessor(b):
-  return _chunk_processors[b]()
+def get_chunkprocessor(b, level=0):
+  return _chunk_processors[b](level=level)
 
 #region Chunk Processing
 class _ChunkProcessorBase(ABC):
@@ -47,6 +53,21 @@ class _ChunkProcessorBase(ABC):
   The various subclasses of this class handle the variety of formats the chunks themselves
   can be stored as.
   """
+  __slots__ = ('_level',)
+
+  _max_level = 0      # Highest compression level the processor supports, or 0 if it has no levels
+
+  def __init__(self, level=0):
+    """Creates a chunk processor.
+
+    The level parameter is a compression level for processors that support one.
+    A level of 0 means the processor's fastest mode. Processors without levels
+    ignore it; for the others, a level outside 0 to _max_level raises ValueError.
+    """
+    if self._max_level and not 0 <= level <= self._max_level:
+      raise ValueError(f'invalid compression level: {level}. Levels are 0-{self._max_level}')
+    self._level = level
+
   @abstractmethod
   def read_chunk(self, stream, chunk_size):
     """Reads the next chunk of data from the stream.
@@ -81,6 +102,8 @@ class _ChunkProcessorBase(ABC):
 @chunkprocessor('uncompressed', b'\x00')
 class _UncompressedChunkProcessor(_ChunkProcessorBase):
   """Chunk processor for uncompressed packages."""
+  __slots__ = ()
+
   def read_chunk(self, stream, chunk_size):
     """Reads the next chunk of data from the stream.
 
@@ -112,6 +135,8 @@ class _CompressedChunkProcessor(_ChunkProcessorBase):
   Packages generally consist of compressed chunks. The purpose of this class is to
   facilitate reading and writing package data one chunk at a time.
   """
+  __slots__ = ()
+
   def read_chunk(self, stream, chunk_size):
     """Reads the next chunk of data from the stream.
 
@@ -119,14 +144,26 @@ class _CompressedChunkProcessor(_ChunkProcessorBase):
     from the stream, then call decompress to decompress it if it is indeed compressed. 
     The decompress function should return a chunk of the correct size by padding it with 0-bytes.
     """
-    if stream.read(1) != 0:
-      # The chunk is compressed. Read it, then decompress it.
-      compSize = stream.read_int()
+    return self.read_chunk_deferred(stream, chunk_size)()
+
+  def read_chunk_deferred(self, stream, chunk_size):
+    """Reads the next chunk of data from the stream, but leaves decompressing it until later.
+
+    Returns a function taking no arguments that returns the decompressed chunk. This lets
+    callers read chunks from the stream in order on one thread, while decompressing them
+    on another.
+    """
+    # Read the compression flag byte and (if compressed) the size of the data together
+    header = stream.read(5)
+    if header[0:1] != _UNCOMPRESSED_FLAG:
+      # The chunk is compressed. Read it now, and decompress it when asked.
+      compSize = int.from_bytes(header[1:], byteorder='big', signed=True)
       compressedData = stream.read(compSize)
-      return self.decompress(compressedData, chunk_size)
+      return lambda: self.decompress(compressedData, chunk_size)
     else:
-      # The chunk is not compressed. Just read it.
-      return stream.read(chunk_size)
+      # The chunk is not compressed, so the bytes after the flag are already chunk data.
+      data = header[1:] + stream.read(chunk_size - 4)
+      return lambda: data
 
   def write_chunk(self, stream, chunk):
     """Writes a chunk of data to the stream.
@@ -134,10 +171,18 @@ class _CompressedChunkProcessor(_ChunkProcessorBase):
     In this case, the data is assumed compressed, so this will compress the given chunk
     of data, then write the compressed data to the stream.
     """
-    compressedData = self.compress(chunk)
-    stream.write(bytes([1]))                # The "1" indicates it's compressed
-    stream.write_int(len(compressedData))   # Then write the length of the compressed data
-    stream.write(compressedData)            # Then write the compressed data itself
+    self.write_compressed_chunk(stream, self.compress(chunk))
+
+  def write_compressed_chunk(self, stream, compressedData):
+    """Writes a chunk of data that has already been passed through compress to the stream.
+
+    This allows callers to do the compression elsewhere (e.g. on another thread)
+    while still writing the chunks out in order.
+    """
+    # Write the flag indicating it's compressed and the length of the compressed data together,
+    # then the compressed data itself (separately, so it isn't copied just to prepend 5 bytes)
+    stream.write(_COMPRESSED_FLAG + len(compressedData).to_bytes(4, 'big', signed=True))
+    stream.write(compressedData)
 
   def skip_chunk(self, stream, chunk_size):
     """Skips past the next chunk of data in the stream.
@@ -146,13 +191,14 @@ class _CompressedChunkProcessor(_ChunkProcessorBase):
     Therefore, this function will read in that size, but then just seek past the
     actual chunk data.
     """
-    if stream.read(1) != 0:
+    header = stream.read(5)
+    if header[0:1] != _UNCOMPRESSED_FLAG:
       # The chunk is compressed. Read the size, then seek past it.
-      compSize = stream.read_int()
+      compSize = int.from_bytes(header[1:], byteorder='big', signed=True)
       stream.seek(compSize, os.SEEK_CUR)
     else:
-      # The chunk is not compressed. Just seek past it.
-      stream.seek(chunk_size, os.SEEK_CUR)
+      # The chunk is not compressed. Just seek past it (less what we already read).
+      stream.seek(chunk_size - 4, os.SEEK_CUR)
 
   @abstractmethod
   def compress(self, chunk):
@@ -161,7 +207,13 @@ class _CompressedChunkProcessor(_ChunkProcessorBase):
 
   @abstractmethod
   def decompress(self, chunk, chunk_size):
-    """Decompresses the given chunk, zero-filling to chunk_size."""
+    """Decompresses the given chunk, zero-filling to chunk_size.
+
+    This returns a newly allocated chunk each time rather than filling a reused buffer:
+    the lz4 and lzf modules can't decompress into a buffer supplied by the caller, and
+    the reader holds two chunks at once anyway (the current one, and the next one being
+    decompressed ahead of time).
+    """
     pass
 
 @requires('lz4')
@@ -171,14 +223,31 @@ class _Lz4ChunkProcessor(_CompressedChunkProcessor):
 
   Packages in Hades are compressed using LZ4. The 'lz4' module
   is required to use this chunk processor.
+
+  Each chunk is a standalone LZ4 block. The game decompresses chunks on
+  its own, so chunks cannot depend on a preset dictionary or on each
+  other -- any such scheme would produce packages the game can't read.
   """
+  __slots__ = ()
+
+  _max_level = 12
+
   def compress(self, chunk):
-    """Compresses a block of data using LZ4 compression."""
-    return lz4.block.compress(chunk, mode='high_compression', store_size=False)
+    """Compresses a block of data using LZ4 compression.
+
+    Level 0 uses the fast LZ4 mode. Levels 1-12 use LZ4HC at that level, which
+    compresses better but is much slower.
+    """
+    if self._level == 0:
+      return lz4.block.compress(chunk, store_size=False)
+    return lz4.block.compress(chunk, mode='high_compression', compression=self._level, store_size=False)
 
   def decompress(self, chunk, chunk_size):
     """Decompresses an LZ4-compressed block of data, zero-filling to chunk_size."""
-    return lz4.block.decompress(chunk, uncompressed_size=chunk_size).ljust(chunk_size, b'\x00')
+    data = lz4.block.decompress(chunk, uncompressed_size=chunk_size)
+    if len(data) < chunk_size:
+      data = data.ljust(chunk_size, b'\x00')
+    return data
 
 @requires('lzf')
 @chunkprocessor('lzf', b'\x40')
@@ -188,13 +257,21 @@ class _LzfChunkProcessor(_CompressedChunkProcessor):
   Packages in Transistor are compressed using LZF. The 'lzf' module
   is required to use this chunk processor.
   """
+  __slots__ = ()
+
   def compress(self, chunk):
     """Compresses a block of data using LZF compression."""
+    # The lzf module only accepts read-only buffers, e.g. not the writer's bytearray chunk buffers
+    if not isinstance(chunk, bytes):
+      chunk = bytes(chunk)
     return lzf.compress(chunk)
 
   def decompress(self, chunk, chunk_size):
     """Decompresses an LZF-compressed block of data, zero-filling to chunk_size."""
-    return lzf.decompress(chunk, chunk_size).ljust(chunk_size, b'\x00')
+    data = lzf.decompress(chunk, chunk_size)
+    if len(data) < chunk_size:
+      data = data.ljust(chunk_size, b'\x00')
+    return data
 #endregion
 
 
@@ -207,6 +284,8 @@ class _LzxChunkProcessor(_CompressedChunkProcessor):
 
   This mode of compression is not yet implemented.
   """
+  __slots__ = ()
+
   def compress(self, chunk):
     """Compresses a block of data using LZX compression."""
     raise NotImplementedError('LZX compression is not yet implemented')
@@ -4,13 +4,21 @@ __version__ = "0.1.0.0"
 
 import os
 import sys
+import re
 import fnmatch
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 from .sggpio import PackageWithManifestReader, PackageWithManifestWriter, PackageReader, PackageWriter
 from .entries import AtlasEntry, TextureEntry
+
+EXTRACT_WORKERS = min(4, os.cpu_count() or 1)   # Threads (and so decoded textures in flight) used to export entries while the package is being read
  
 def list_contents(name, *patterns, logger=lambda s: None):
+  patterns = _compile_patterns(patterns)
   with PackageWithManifestReader(name) as f:
+    # Listing only needs entry names, so skip over the entries' data instead of copying it out
+    f.payload_filter = lambda entry_name: False
     for entry in f:
       if not _entry_match(patterns, entry):
         continue
@@ -23,24 +31,39 @@ def list_contents(name, *patterns, logger=lambda s: None):
           subname = subatlas['name']
           logger(f'  {subname}')
 
-def extract(package, target_dir, *entries, subtextures=False, logger=lambda s: None):
+def extract(package, target_dir, *entries, subtextures=False, subtexture_format='png', compress_level=None, logger=lambda s: None):
+  # compress_level is the zlib level (0-9) for exported PNGs; None uses entries.PNG_COMPRESS_LEVEL
+  if compress_level is not None and compress_level not in range(0, 10):
+    raise ValueError(f'invalid PNG compression level: {compress_level}. Levels are 0-9')
+
   includes = []
+  entries = _compile_patterns(entries)
 
   if len(target_dir) == 0:
     target_dir = os.path.splitext(package)[0]
 
   os.makedirs(target_dir, exist_ok=True)
-  with PackageWithManifestReader(package) as f:
+  with PackageWithManifestReader(package) as f, ThreadPoolExecutor(max_workers=EXTRACT_WORKERS) as executor:
     if f.manifest is None and subtextures:
       logger('Exporting subtextures requires a manifest. --subtextures flag ignored')
       subtextures=False
 
+    # Entries are exported (image decoding, PNG encoding) on worker threads while this
+    # thread keeps reading and decompressing the package. The number of entries in flight
+    # is bounded so we don't hold the whole package in memory.
+    pending = deque()
     for entry in f:
       if not _entry_match(entries, entry):
         continue
 
       logger(f'Extracting entry {entry.name}')
-      entry.extract(target_dir, subtextures=subtextures)
+      # Entries are already exported in parallel here, so they shouldn't each start threads of their own
+      pending.append(executor.submit(entry.extract, target_dir, subtextures=subtextures, subtexture_format=subtexture_format, compress_level=compress_level, parallel=False))
+      if len(pending) > 2 * EXTRACT_WORKERS:
+        pending.popleft().result()
+
+    while pending:
+      pending.popleft().result()
 
     if not f.manifest is None:
       for entry in f.manifest.values():
@@ -48,7 +71,7 @@ def extract(package, target_dir, *entries, subtextures=False, logger=lambda s: N
           continue
         
         logger(f'Extracting manifest entry {entry.name}')
-        entry.extract(target_dir, subtextures=subtextures, includes=includes)
+        entry.extract(target_dir, subtextures=subtextures, subtexture_format=subtexture_format, compress_level=compress_level, includes=includes)
 
     if len(includes) > 0:
       include_dir = os.path.join(target_dir, 'manifest')
@@ -59,7 +82,7 @@ def extract(package, target_dir, *entries, subtextures=False, logger=lambda s: N
           inc_f.write(include)
           inc_f.write('\n')
 
-def pack(source_dir, package, *entries, logger=lambda s: None):
+def pack(source_dir, package, *entries, compressor_level=0, logger=lambda s: None):
   curdir = os.getcwd()
   source = os.path.join(curdir, source_dir)
   target = package
@@ -71,18 +94,20 @@ def pack(source_dir, package, *entries, logger=lambda s: None):
 
   manifest_dir = os.path.join(source, 'manifest')
   manifest_entries = []
+  entries = _compile_patterns(entries)
   logger('Scanning Manifest')
-  for filename in os.listdir(manifest_dir):
-    if filename.endswith('.json'):
-      entry = _load_manifest_entry(os.path.join(manifest_dir, filename))
-      if not _entry_match(entries, entry):
-        continue
-      logger(entry.name)
-      manifest_entries.append(entry)
+  with os.scandir(manifest_dir) as it:
+    for dir_entry in it:
+      if dir_entry.name.endswith('.json') and dir_entry.is_file():
+        entry = _load_manifest_entry(dir_entry.path)
+        if not _entry_match(entries, entry):
+          continue
+        logger(entry.name)
+        manifest_entries.append(entry)
   
-  with PackageWriter(target, compressor='lz4') as pkg_writer, PackageWriter(f'{target}_manifest') as manifest_writer:
+  with PackageWriter(target, compressor='lz4', compressor_level=compressor_level) as pkg_writer, PackageWriter(f'{target}_manifest') as manifest_writer:
     for manifest_entry in manifest_entries:
-      entry_name = manifest_entry.name.split('\\')[-1]
+      entry_name = manifest_entry.short_name()
       entry_sheet_path = os.path.join(source, 'textures', 'atlases', f'{entry_name}.png')
       if os.path.exists(entry_sheet_path):
         logger(f'Packing {entry_sheet_path}')
@@ -105,21 +130,29 @@ def patch(name, *patches, logger=lambda s : None):
   # Get the entries to replace in the package from the patches
   patch_entries = {}
   for patch in patches:
-    for entry in PackageWithManifestReader(patch):
-      patch_entries[entry.name] = entry
+    with PackageWithManifestReader(patch) as patch_reader:
+      for entry in patch_reader:
+        patch_entries[entry.name] = entry
 
   # Open the old package for reading and a new package for writing
   with PackageWithManifestReader(package_old_path) as source, PackageWithManifestWriter(name, compressor=source.compressor, version=source.version) as target:
-    # Scan source package, replacing entries with the patched versions if present
+    # Entries being replaced are thrown away, so don't bother copying their data out
+    source.payload_filter = lambda entry_name: entry_name not in patch_entries
+
+    # Scan source package a chunk at a time, replacing entries with the patched versions if present.
+    # Chunks without any patched entries can be copied over without recompressing them.
+    can_copy_chunks = hasattr(source.chunkprocessor, 'compress')
+    chunk_num = 0
+    chunk_entries = []    # Pairs of (entry, patched entry or None) in the current chunk
     for entry in source:
-      if entry.name in patch_entries:
-        # Write the entry from the patches
-        logger(f'Applying patch to entry {entry.name}')
-        target.write_entry_with_manifest(patch_entries.pop(entry.name))
-      else:
-        # No matching entry in patches, so just write the original entry
-        logger(f'No patch for entry {entry.name}, using original entry')
-        target.write_entry_with_manifest(entry)
+      if source.virtual_pos[0] != chunk_num:
+        _write_patched_chunk(source, target, chunk_num, chunk_entries, can_copy_chunks, logger)
+        chunk_num = source.virtual_pos[0]
+        chunk_entries = []
+      chunk_entries.append((entry, patch_entries.pop(entry.name, None)))
+
+    # The last chunk ends the file, so it always needs rewriting
+    _write_patched_chunk(source, target, chunk_num, chunk_entries, False, logger)
 
     # Append any entries in patches that weren't in the source
     for entry in patch_entries.values():
@@ -130,6 +163,23 @@ def patch(name, *patches, logger=lambda s : None):
   os.remove(package_old_path)
   os.remove(manifest_old_path)
 
+def _write_patched_chunk(source, target, chunk_num, chunk_entries, can_copy, logger):
+  if can_copy and chunk_num > 0 and all(patched is None for _, patched in chunk_entries):
+    # Nothing to patch, so copy the chunk across still compressed
+    logger(f'No patches for chunk {chunk_num}, using original chunk')
+    target.write_raw_chunk_with_manifest(source.read_raw_chunk(chunk_num), [entry for entry, _ in chunk_entries])
+    return
+
+  for entry, patched in chunk_entries:
+    if patched is not None:
+      # Write the entry from the patches
+      logger(f'Applying patch to entry {entry.name}')
+      target.write_entry_with_manifest(patched)
+    else:
+      # No matching entry in patches, so just write the original entry
+      logger(f'No patch for entry {entry.name}, using original entry')
+      target.write_entry_with_manifest(entry)
+
 def _load_manifest_entry(filename):
   if filename.endswith(".atlas.json"):
     entry = AtlasEntry()
@@ -138,11 +188,13 @@ def _load_manifest_entry(filename):
   else:
     raise NotImplementedError('Unsupported manifest file type')
 
+def _compile_patterns(patterns):
+  # Translate the glob patterns to regexes once, rather than once per entry
+  return [re.compile(fnmatch.translate(os.path.normcase(pattern))) for pattern in patterns or ()]
+
 def _entry_match(patterns, entry):
-  if patterns is None or len(patterns) == 0:
+  # patterns should come from _compile_patterns
+  if len(patterns) == 0:
     return True
-  else:
-    for pattern in patterns:
-      if fnmatch.fnmatch(entry.short_name(), pattern):
-        return True
-  return False
\ No newline at end of file
+  name = os.path.normcase(entry.short_name())
+  return any(pattern.match(name) for pattern in patterns)
@@ -1,16 +1,71 @@
 from abc import ABC, abstractmethod
 import os
+import sys
 import json
-from .utils import requires, BytesIO as _BytesIO, FileIO as _FileIO
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from .utils import requires, BytesIO as _BytesIO
 
 try: import PIL.Image
 except ImportError: pass
+try: import orjson
+except ImportError: pass
+
+_entry_types = {}                   # Stores a mapping of known entry types from their byte codes (as ints)
+
+SUBTEXTURE_WORKERS = os.cpu_count() or 1    # Threads used to save the subtextures of a texture
+PNG_COMPRESS_LEVEL = 1                      # zlib level for exported PNGs; extracted files favour speed over size
+TEXTURE_DECODE_WORKERS = os.cpu_count() or 1    # Threads used to decode a block-compressed (BCn) texture
+TEXTURE_DECODE_STRIP_HEIGHT = 512           # Minimum height of the strips a BCn texture is split into for decoding
 
-_entry_types = {}                   # Stores a mapping of known entry types from their byte codes
+# Fixed-size parts of entries, packed/unpacked in one go rather than a field at a time
+_SUBATLAS_STRUCT = struct.Struct('>8i2f')   # rect x/y/width/height, topLeft x/y, originalSize x/y, scaleRatio x/y
+_INT_PAIR_STRUCT = struct.Struct('>2i')
 
 def get_entry(b, stream, is_manifest=False):
+  # b is the type code, either as a one-byte bytes object or as the int value of that byte
+  if not isinstance(b, int):
+    b = b[0]
   return _entry_types[b](stream, isManifest=is_manifest)
 
+def _json_loads(s):
+  """Parses JSON text, using orjson if it's installed since it's much faster."""
+  if 'orjson' in sys.modules:
+    return orjson.loads(s)
+  return json.loads(s)
+
+def _json_dumps(obj):
+  """Serializes an object to UTF-8 encoded JSON, using orjson if it's installed since it's much faster.
+
+  Without orjson, the output is formatted the same way (compact, non-ASCII characters left
+  unescaped), so exported files don't depend on which modules are installed.
+  """
+  if 'orjson' in sys.modules:
+    return orjson.dumps(obj)
+  return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+def _save_image_png(image, path, compress_level=PNG_COMPRESS_LEVEL):
+  """Saves an image to path + '.png'."""
+  image.save(f'{path}.png', compress_level=compress_level)
+
+def _save_image_raw(image, path, compress_level=PNG_COMPRESS_LEVEL):
+  """Saves an image's RGBA pixels to path + '.raw', with no header or compression."""
+  with open(f'{path}.raw', 'wb') as f:
+    f.write(image.tobytes())
+
+def _save_image_npy(image, path, compress_level=PNG_COMPRESS_LEVEL):
+  """Saves an image as a height x width x 4 numpy array to path + '.npy'."""
+  # numpy is slow to import, so it's only imported if this format is actually used
+  try: import numpy
+  except ImportError: raise ImportError('_save_image_npy: This action requires the numpy module.')
+  numpy.save(f'{path}.npy', numpy.asarray(image))
+
+_subtexture_savers = {              # Functions for saving subtextures, by format name
+  'png': _save_image_png,
+  'raw': _save_image_raw,
+  'npy': _save_image_npy
+}
+
 def import_entry(filename):
   if filename.endswith(".atlas.json"):
     entry = AtlasEntry()
@@ -32,7 +87,7 @@ def entry(typeName, typeCode):
     cls.typeName = typeName
     cls.typeCode = typeCode
     if typeCode:
-      _entry_types[typeCode] = cls
+      _entry_types[typeCode[0]] = cls
     return cls
   return decorate_entry
 
@@ -42,6 +97,8 @@ class EntryBase(ABC):
   When reading entries from packages, each one should be
   an instance of a subclass of this class.
   """
+  __slots__ = ('_name', '_short_name', 'manifest_entry')
+
   _typeName = 'base'
   _typeCode = b'x\00'
 
@@ -88,13 +145,28 @@ class EntryBase(ABC):
     """
     pass
 
+  def size_hint(self):
+    """The number of bytes write_to will write, or None if that isn't known without writing it."""
+    return None
+
   def display_name(self):
     """A display name for the entry in e.g. command-line interfaces."""
     dispname = self.name
     return f'{self.entry_type()}: {dispname}'
 
+  @property
+  def name(self):
+    """The full name of the entry, e.g. GUI\\Icons\\Sheet01."""
+    return self._name
+
+  @name.setter
+  def name(self, value):
+    self._name = value
+    self._short_name = value.rsplit('\\', 1)[-1]    # short_name is looked up a lot, so work it out once
+
   def short_name(self):
-    return self.name.split('\\')[-1]
+    """The last component of the entry's name."""
+    return self._short_name
 
   def entry_type(self):
     """Returns the type of entry this is as a human-readable string."""
@@ -144,9 +216,12 @@ class EntryBase(ABC):
     if os.path.splitext(path)[1] != '.entry':
       return False
 
-    with _FileIO(path, 'wb') as f:
-      f.write(self._typeCode)     # Write the type code byte
-      self.write_to(f)            # Then write byte data for the entry
+    # Entries are written a field at a time, so build the file in memory and write it all at once
+    entrystream = _BytesIO()
+    entrystream.write(self._typeCode)     # Write the type code byte
+    self.write_to(entrystream)            # Then write byte data for the entry
+    with open(path, 'wb') as f:
+      f.write(entrystream.getbuffer())
     return True
 
   def _import(self, path):
@@ -154,13 +229,15 @@ class EntryBase(ABC):
     if os.path.splitext(path)[1] != '.entry':
       return False
 
-    with _FileIO(path, 'rb') as f:
-      f.read(1)                   # Skip the entry code byte (we already knew it)
-      self.read_from(f)           # Read the remaining bytes
+    # Entries are read a field at a time, so read the file in one go and parse it from memory
+    with open(path, 'rb') as f:
+      entrystream = _BytesIO(f.read())
+    entrystream.read(1)                   # Skip the entry code byte (we already knew it)
+    self.read_from(entrystream)           # Read the remaining bytes
     return True
 
   def _extraction_path(self, target):
-    return os.path.join(target, self.name.split('\\')[-1])
+    return os.path.join(target, self.short_name())
 
 
 class XNBAssetEntryBase(EntryBase):
@@ -173,18 +250,32 @@ class XNBAssetEntryBase(EntryBase):
   to .xnb files, which can be generated by other tools, such as MonoGame
   Pipeline.
   """
+  __slots__ = ('size', 'data')
+
   def read_from(self, stream, isManifest=False, version=7):
     self.name = stream.read_string()
     self.size = stream.read_int()
-    self.data = stream.read(self.size)
+    payload_filter = getattr(stream, 'payload_filter', None)
+    if payload_filter is not None and not payload_filter(self.name):
+      # The reader doesn't need this entry's data, so don't copy it out of the stream
+      stream.skip(self.size)
+      self.data = None
+    else:
+      self.data = stream.read(self.size)
 
   def write_to(self, stream):
     stream.write_string(self.name)
     stream.write_int(self.size)
     stream.write(self.data)
 
+  def size_hint(self):
+    if self.data is None:
+      # The data was skipped when reading (see payload_filter), so there's nothing to measure
+      return None
+    return 1 + len(self.name) + 4 + len(self.data)
+
   def display_name(self):
-    dispname = self.name.split('\\')[-1]
+    dispname = self.short_name()
     return f'{self.entry_type()}: {dispname}'
 
   def extract(self, target, **kwargs):
@@ -209,7 +300,7 @@ class XNBAssetEntryBase(EntryBase):
     return True
 
   def _extraction_path(self, target):
-    return os.path.join(target, 'textures', self.name.split('\\')[-1])
+    return os.path.join(target, 'textures', self.short_name())
 
 
 @entry('texture', b'\xAD')
@@ -223,24 +314,46 @@ class TextureEntry(XNBAssetEntryBase):
   These entries can be exported to and imported from various image formats,
   but doing so requires the pillow/PIL module.
   """
+  __slots__ = ('imgsize', '_image', '_image_data')
+
+  def __init__(self, stream=None, isManifest=False, version=7):
+    self._image = None        # The decoded image, cached since decoding BCn textures is slow
+    self._image_data = None   # The data the cached image was decoded from
+    super().__init__(stream, isManifest, version)
+
   def extract(self, target, **kwargs):
+    # parallel=False tells the entry the caller is already exporting on several threads (as
+    # deppth.extract does), so it shouldn't start threads of its own
+    compress_level = kwargs.get('compress_level')
+    if compress_level is None:
+      compress_level = PNG_COMPRESS_LEVEL
+    parallel = kwargs.get('parallel', True)
     if 'subtextures' in kwargs and kwargs['subtextures']:
-      self._export_subtextures(os.path.join(target, 'textures'))
+      subtexture_format = kwargs.get('subtexture_format', 'png')
+      self._export_subtextures(os.path.join(target, 'textures'), compress_level, subtexture_format, parallel)
     else:
       os.makedirs(os.path.join(target, 'textures', 'atlases'), exist_ok=True)
-      self._export(self._extraction_path(target) + '.png')
+      self._export(self._extraction_path(target) + '.png', compress_level, parallel)
 
   @requires('PIL.Image')
-  def _export(self, path):
+  def _export(self, path, compress_level=PNG_COMPRESS_LEVEL, parallel=True):
     # If the user didn't ask for a supported image format, then don't export
     if os.path.splitext(path)[1] not in ['.png', '.jpg', '.bmp']:
       return super()._export(path)
 
-    self._get_image().save(path)
+    # compress_level only applies to PNGs; other formats ignore it
+    self._get_image(parallel).save(path, compress_level=compress_level)
     return True
 
   @requires('PIL.Image')
-  def _get_image(self):
+  def _get_image(self, parallel=True):
+    # Reuse the last decoded image, unless the entry's data has been replaced since
+    if self._image is None or self._image_data is not self.data:
+      self._image = self._decode_image(parallel)
+      self._image_data = self.data
+    return self._image
+
+  def _decode_image(self, parallel=True):
     dataio = _BytesIO(self.data)
 
     # The first four bytes should be b'XNBw'
@@ -273,23 +386,54 @@ class TextureEntry(XNBAssetEntryBase):
     self.imgsize = (dataio.read_int('little'), dataio.read_int('little'))
     dataio.read_int('little')  # mip level, it should always be 1
     numbytes = dataio.read_int('little')
-    imgbytes = dataio.read(numbytes)
+
+    # Pillow decodes straight from a view of the pixel data, so don't copy it out of the entry first
+    pos = dataio.tell()
+    imgbytes = memoryview(self.data)[pos:pos+numbytes]
     if imgformat == 0:
       image = PIL.Image.frombytes('RGBA', self.imgsize, imgbytes, 'raw', 'BGRA')
     elif imgformat == 6:
-      image = PIL.Image.frombytes('RGBA', self.imgsize, imgbytes, 'bcn', (3,))
+      image = self._decode_bcn(imgbytes, 3, parallel)
     elif imgformat == 28:
-      image = PIL.Image.frombytes('RGBA', self.imgsize, imgbytes, 'bcn', (7,))
+      image = self._decode_bcn(imgbytes, 7, parallel)
     else:
       raise Exception(f'Unsupported image format {imgformat}')
     return image
+
+  def _decode_bcn(self, imgbytes, bcnformat, parallel=True):
+    # BC3 and BC7 both store each 4x4 block of pixels in 16 bytes, so any strip of the image
+    # whose height is a multiple of 4 can be decoded on its own. Pillow releases the GIL while
+    # decoding, so large textures are decoded a strip per thread and then pasted together
+    # (unless the caller asked us not to).
+    width, height = self.imgsize
+    numstrips = min(TEXTURE_DECODE_WORKERS, height // TEXTURE_DECODE_STRIP_HEIGHT)
+    if numstrips <= 1 or not parallel:
+      return PIL.Image.frombytes('RGBA', self.imgsize, imgbytes, 'bcn', (bcnformat,))
+
+    rowbytes = (width + 3) // 4 * 16                          # Bytes per row of blocks
+    stripheight = (height + numstrips - 1) // numstrips
+    stripheight = (stripheight + 3) // 4 * 4                  # Round up to whole blocks
+
+    def decode_strip(y):
+      h = min(stripheight, height - y)
+      start = y // 4 * rowbytes
+      end = start + (h + 3) // 4 * rowbytes
+      return PIL.Image.frombytes('RGBA', (width, h), imgbytes[start:end], 'bcn', (bcnformat,))
+
+    image = PIL.Image.new('RGBA', self.imgsize)
+    with ThreadPoolExecutor(max_workers=numstrips) as executor:
+      strips = range(0, height, stripheight)
+      for y, strip in zip(strips, executor.map(decode_strip, strips)):
+        image.paste(strip, (0, y))
+    return image
   
   @requires('PIL.Image')
   def _import_image_data(self, path):
-    image = PIL.Image.open(path)
+    with PIL.Image.open(path) as image:
+      imgbytes = image.convert('RGBA').tobytes('raw', 'BGRA', 0, 1)
+      inner_header = self._create_inner_xnb_header(image, imgbytes)
 
     dataio = _BytesIO()
-    xnb_inner_data = self._create_inner_xnb(image)
 
     # Write the XNB 'magic' header
     dataio.write(bytes('XNBw', 'ascii'))
@@ -301,24 +445,22 @@ class TextureEntry(XNBAssetEntryBase):
     dataio.write(b'\x00')
 
     # Write the file size (inner length plus 10 for the header)
-    dataio.write_int(len(xnb_inner_data) + 10, 'little')
-
-    # Write the payload
-    dataio.write(xnb_inner_data)
+    dataio.write_int(len(inner_header) + len(imgbytes) + 10, 'little')
 
-    self.data = dataio.getvalue()
+    # Write the payload. The pixel data is by far the largest part, so it's appended
+    # in a single step instead of being copied through the stream.
+    dataio.write(inner_header)
+    self.data = dataio.getvalue() + imgbytes
     self.size = len(self.data)
   
   @requires('PIL.Image')
-  def _create_inner_xnb(self, image):
+  def _create_inner_xnb_header(self, image, imgbytes):
     dataio = _BytesIO()
     dataio.write_int(0, 'little') # Format for now is always 0
     dataio.write_int(image.width, 'little')
     dataio.write_int(image.height, 'little')
     dataio.write_int(1, 'little')
-    imgbytes = image.convert('RGBA').tobytes('raw', 'BGRA', 0, 1)
     dataio.write_int(len(imgbytes), 'little')
-    dataio.write(imgbytes)
     return dataio.getvalue()
 
   def import_file(self, path):
@@ -329,43 +471,55 @@ class TextureEntry(XNBAssetEntryBase):
     self._import_image_data(path)
 
   def _unpack(self, path):
-    # Make a directory to hold the contents
+    # Make a directory to hold the contents, then export the subtextures into it
     subpath = self.name.replace('\\', '/')
     fullpath = os.path.join(path, subpath)
     os.makedirs(fullpath, exist_ok=True)
-
-    # First, get the image out of the entry data
-    image = self._get_image()
-    atlas = self.manifest_entry
-    for subatlas in atlas.subAtlases:
-      rect = subatlas['rect']
-      box = (rect['x'], 
-      rect['y'], 
-      rect['x']+rect['width'], 
-      rect['y']+rect['height'])
-      subimage = image.crop(box)
-      subatlasdir, subatlasfile = os.path.split(subatlas['name'])
-      os.makedirs(os.path.join(fullpath, subatlasdir), exist_ok=True)
-      subimage.save(os.path.join(fullpath, subatlasdir, f'{subatlasfile}.png'))
+    self._export_subtextures(fullpath)
 
   @requires('PIL.Image')
-  def _export_subtextures(self, target):
+  def _export_subtextures(self, target, compress_level=PNG_COMPRESS_LEVEL, subtexture_format='png', parallel=True):
+    # Subtextures are PNGs by default. Tools that only want the pixels can skip PNG encoding
+    # by asking for raw RGBA data (sized by the atlas rects) or numpy arrays instead.
+    if subtexture_format not in _subtexture_savers:
+      raise ValueError(f'Unsupported subtexture format: {subtexture_format}')
+    save_image = _subtexture_savers[subtexture_format]
+
     # First, get the image out of the entry data
-    image = self._get_image()
+    image = self._get_image(parallel)
     atlas = self.manifest_entry
-    for subatlas in atlas.subAtlases:
-      rect = subatlas['rect']
-      box = (rect['x'], 
-      rect['y'], 
-      rect['x']+rect['width'], 
-      rect['y']+rect['height'])
-      subimage = image.crop(box)
-      subatlasdir, subatlasfile = os.path.split(subatlas['name'])
-      os.makedirs(os.path.join(target, subatlasdir), exist_ok=True)
-      subimage.save(os.path.join(target, subatlasdir, f'{subatlasfile}.png'))
+
+    def crop_subtextures():
+      subatlasdirs = set()    # Directories already created; many subtextures share one
+      for subatlas in atlas.subAtlases:
+        rect = subatlas['rect']
+        box = (rect['x'], 
+        rect['y'], 
+        rect['x']+rect['width'], 
+        rect['y']+rect['height'])
+        subimage = image.crop(box)  # Copies only the sprite's pixels, which saving needs as their own image anyway
+        subatlasdir, subatlasfile = os.path.split(subatlas['name'])
+        if subatlasdir not in subatlasdirs:
+          os.makedirs(os.path.join(target, subatlasdir), exist_ok=True)
+          subatlasdirs.add(subatlasdir)
+        yield subimage, os.path.join(target, subatlasdir, subatlasfile)
+
+    # Cropping is cheap, but encoding isn't. Pillow releases the GIL while encoding, so the
+    # subtextures are saved on a pool of threads, unless the caller asked us not to.
+    if not parallel:
+      for subimage, subpath in crop_subtextures():
+        save_image(subimage, subpath, compress_level)
+      return
+
+    with ThreadPoolExecutor(max_workers=SUBTEXTURE_WORKERS) as executor:
+      saves = [executor.submit(save_image, subimage, subpath, compress_level) for subimage, subpath in crop_subtextures()]
+
+      # Surface any errors from saving
+      for save in saves:
+        save.result()
 
   def _extraction_path(self, target):
-    return os.path.join(target, 'textures', 'atlases', self.name.split('\\')[-1])
+    return os.path.join(target, 'textures', 'atlases', self.short_name())
 
 
 @entry('texture3d', b'\xAA')
@@ -381,8 +535,10 @@ class Texture3DEntry(XNBAssetEntryBase):
   For now, exporting and importing to anything other than .xnb or .entry is
   unsupported.
   """
+  __slots__ = ()
+
   def _extraction_path(self, target):
-    return os.path.join(target, 'textures', '3d', self.name.split('\\')[-1])
+    return os.path.join(target, 'textures', '3d', self.short_name())
 
 
 @entry('bink', b'\xBB')
@@ -401,6 +557,8 @@ class BinkEntry(EntryBase):
   it cannot be exported to or imported from any format (other than the
   standard .entry)
   """
+  __slots__ = ('isAlpha', 'scaling')
+
   def read_from(self, stream, isManifest=False, version=7):
     firstByte = stream.read(1)
     self.isAlpha = (firstByte == b'\x01')
@@ -416,7 +574,7 @@ class BinkEntry(EntryBase):
     pass
 
   def display_name(self):
-    dispname = self.name.split('\\')[-1]
+    dispname = self.short_name()
     return f'{self.entry_type()}: {dispname}'
   
   def extract(self, target, **kwargs):
@@ -425,7 +583,7 @@ class BinkEntry(EntryBase):
     super().extract(target, **kwargs)
 
   def _extraction_path(self, target):
-    return os.path.join(target, 'bink_refs', self.name.split('\\')[-1])
+    return os.path.join(target, 'bink_refs', self.short_name())
 
 
 @entry('atlas', b'\xDE')
@@ -437,53 +595,66 @@ class AtlasEntry(EntryBase):
   The data in the entry essentially amounts to encoding of the positions and
   sizes of various rectangles representing different sprites.
 
-  Atlas entries can be exported to and imported from .json files.
+  Atlas entries can be exported to and imported from .json files. The
+  subAtlases list holds one dict per sprite in exactly the shape of that
+  JSON, so it can be dumped and loaded without conversion.
   """
+  __slots__ = ('version', 'subAtlases', 'isReference', 'referencedTextureName', 'includedTexture')
+
   def read_from(self, stream, isManifest=False, version=7):
     stream.read(4)  # This is the size, but we don't care about this and it gets ignored
     self.version = 0
-    numSubAtlases = int.from_bytes(stream.read(4), byteorder='big')
+    numSubAtlases = stream.read_int()
     if (numSubAtlases == 2142336875):   # No, I can't explain this           
       self.version = stream.read_int()
       numSubAtlases = stream.read_int()
+    # Which optional fields each subatlas has depends only on the version, so work that out once
+    hasFlags = self.version > 0
+    hasMultiMipFlags = self.version > 1
+    hasAlpha8Flag = self.version > 3
+    hasHull = self.version > 2
+
     self.subAtlases = []
     for _ in range(0, numSubAtlases):
       name = stream.read_string()
+      x, y, width, height, topLeftX, topLeftY, originalX, originalY, scaleX, scaleY = \
+        _SUBATLAS_STRUCT.unpack(stream.read(_SUBATLAS_STRUCT.size))
       rect = {
-        'x': stream.read_int(),
-        'y': stream.read_int(),
-        'width': stream.read_int(),
-        'height': stream.read_int()
+        'x': x,
+        'y': y,
+        'width': width,
+        'height': height
       }
       topLeft = {
-        'x': stream.read_int(),
-        'y': stream.read_int()
+        'x': topLeftX,
+        'y': topLeftY
       }
       originalSize = {
-        'x': stream.read_int(),
-        'y': stream.read_int()
+        'x': originalX,
+        'y': originalY
       }
       scaleRatio = {
-        'x': stream.read_single(),
-        'y': stream.read_single()
+        'x': scaleX,
+        'y': scaleY
       }
       isMulti = False
       isMip = False
       isAlpha8 = False
-      if (self.version > 0):
+      if hasFlags:
         flags = ord(stream.read(1))
-        if (self.version > 1):
+        if hasMultiMipFlags:
           isMulti = (flags & 1) != 0
           isMip = (flags & 2) != 0
-          if (self.version > 3):
+          if hasAlpha8Flag:
               isAlpha8 = (flags & 4) != 0
       hullPoints = []
-      if (self.version > 2):
+      if hasHull:
         hullCount = stream.read_int()
-        for _ in range(0, hullCount):
+        coords = stream.read_ints(2 * hullCount)    # x, y, x, y, ...
+        for i in range(0, 2 * hullCount, 2):
           hullPoints.append({
-            'x': stream.read_int(),
-            'y': stream.read_int()
+            'x': coords[i],
+            'y': coords[i + 1]
           })
       self.subAtlases.append({
         'name': name,
@@ -497,7 +668,7 @@ class AtlasEntry(EntryBase):
         'hull': hullPoints
       })
     
-    if (int.from_bytes(stream.read(1), byteorder='big') == 221) or isManifest:
+    if (stream.read(1) == b'\xdd') or isManifest:   # 221 marks a reference to a texture elsewhere
       self.isReference = True
       self.referencedTextureName = stream.read_string()
       self.name = self.referencedTextureName
@@ -512,41 +683,49 @@ class AtlasEntry(EntryBase):
     contentsBytes.write_int(2142336875)
     contentsBytes.write_int(self.version)
     contentsBytes.write_int(len(self.subAtlases))
+    hasFlags = self.version > 0
+    hasHull = self.version > 2
     for subAtlas in self.subAtlases:
       contentsBytes.write_string(subAtlas['name'])
-      contentsBytes.write_int(subAtlas['rect']['x'])
-      contentsBytes.write_int(subAtlas['rect']['y'])
-      contentsBytes.write_int(subAtlas['rect']['width'])
-      contentsBytes.write_int(subAtlas['rect']['height'])
-      contentsBytes.write_int(subAtlas['topLeft']['x'])
-      contentsBytes.write_int(subAtlas['topLeft']['y'])
-      contentsBytes.write_int(subAtlas['originalSize']['x'])
-      contentsBytes.write_int(subAtlas['originalSize']['y'])
-      contentsBytes.write_single(subAtlas['scaleRatio']['x'])
-      contentsBytes.write_single(subAtlas['scaleRatio']['y'])
-
-      if (self.version > 0):
+      rect = subAtlas['rect']
+      contentsBytes.write(_SUBATLAS_STRUCT.pack(
+        rect['x'], rect['y'], rect['width'], rect['height'],
+        subAtlas['topLeft']['x'], subAtlas['topLeft']['y'],
+        subAtlas['originalSize']['x'], subAtlas['originalSize']['y'],
+        subAtlas['scaleRatio']['x'], subAtlas['scaleRatio']['y']))
+
+      if hasFlags:
         flags = 1 if subAtlas['isMulti'] else 0
         flags = flags + (2 if subAtlas['isMip'] else 0)
         flags = flags + (4 if subAtlas['isAlpha8'] else 0)
         contentsBytes.write(bytes([flags]))
 
-      if (self.version > 2):
+      if hasHull:
         contentsBytes.write_int(len(subAtlas['hull']))
+        coords = []
         for point in subAtlas['hull']:
-          contentsBytes.write_int(point['x'])
-          contentsBytes.write_int(point['y'])
+          coords.append(point['x'])
+          coords.append(point['y'])
+        contentsBytes.write_ints(coords)
       
     contentsBytes.write(bytes([221 if self.isReference else 0]))
 
+    # An included texture is far bigger than the rest of the atlas. If we know its size up front,
+    # write it straight to the stream afterwards instead of growing contentsBytes to hold it.
+    textureSize = 0
     if self.isReference:
       contentsBytes.write_string(self.referencedTextureName)
     else:
-      self.includedTexture.write_to(contentsBytes)
+      textureSize = self.includedTexture.size_hint()
+      if textureSize is None:
+        textureSize = 0
+        self.includedTexture.write_to(contentsBytes)
 
     buf = contentsBytes.getbuffer()
-    stream.write_int(len(buf) - 35)     # Apparently the size is wrong. No one cares.
-    stream.write(bytes(buf))
+    stream.write_int(len(buf) + textureSize - 35)   # Apparently the size is wrong. No one cares.
+    stream.write(buf)                               # Streams take the buffer as-is, so there's no need to copy it to bytes
+    if textureSize:
+      self.includedTexture.write_to(stream)
 
   def _export(self, path):
     # If the user didn't ask for a supported format, then don't export
@@ -561,8 +740,8 @@ class AtlasEntry(EntryBase):
       'referencedTextureName': self.referencedTextureName
     }
 
-    with open(path, "w") as json_file:
-      json_file.write(json.dumps(data))
+    with open(path, "wb") as json_file:
+      json_file.write(_json_dumps(data))
 
     return True
 
@@ -578,8 +757,8 @@ class AtlasEntry(EntryBase):
     if os.path.splitext(path)[1] not in ['.json']:
       return super()._import(path)
 
-    with open(path, "r") as json_file:
-      data = json.load(json_file)
+    with open(path, "rb") as json_file:
+      data = _json_loads(json_file.read())
       self.name = data['name']
       self.version = data['version']
       self.isReference = data['isReference']
@@ -588,7 +767,7 @@ class AtlasEntry(EntryBase):
     return True
   
   def _extraction_path(self, target):
-    return os.path.join(target, 'manifest', self.name.split('\\')[-1])
+    return os.path.join(target, 'manifest', self.short_name())
 
 
 @entry('binkAtlas', b'\xEE')
@@ -605,18 +784,20 @@ class BinkAtlasEntry(EntryBase):
 
   Currently does not support import or export (other than .entry)
   """
+  __slots__ = ('size', 'version', 'width', 'height', 'originalSize', 'scaling')
+
   def read_from(self, stream, isManifest=False, version=7):
     self.size = stream.read_int()
     self.version = stream.read_int()
     if (self.version < 1):
       raise Exception('Invalid Bink Atlas version')
     self.name = stream.read_string()
-    self.width = stream.read_int()
-    self.height = stream.read_int()
+    self.width, self.height = _INT_PAIR_STRUCT.unpack(stream.read(_INT_PAIR_STRUCT.size))
     if (self.version > 1):
+      originalX, originalY = _INT_PAIR_STRUCT.unpack(stream.read(_INT_PAIR_STRUCT.size))
       self.originalSize = {
-        'x': stream.read_int(),
-        'y': stream.read_int()
+        'x': originalX,
+        'y': originalY
       }
       if (self.version > 2):
         self.scaling = stream.read_single()
@@ -625,11 +806,9 @@ class BinkAtlasEntry(EntryBase):
     stream.write_int(self.size)
     stream.write_int(self.version)
     stream.write_string(self.name)
-    stream.write_int(self.width)
-    stream.write_int(self.height)
+    stream.write(_INT_PAIR_STRUCT.pack(self.width, self.height))
     if (self.version > 1):
-      stream.write_int(self.originalSize['x'])
-      stream.write_int(self.originalSize['y'])
+      stream.write(_INT_PAIR_STRUCT.pack(self.originalSize['x'], self.originalSize['y']))
       if (self.version > 2):
         stream.write_single(self.scaling)
 
@@ -639,7 +818,7 @@ class BinkAtlasEntry(EntryBase):
     super().extract(target, **kwargs)
 
   def _extraction_path(self, target):
-    return os.path.join(target, 'manifest', self.name.split('\\')[-1])
+    return os.path.join(target, 'manifest', self.short_name())
 
 
 @entry('include', b'\xCC')
@@ -651,6 +830,8 @@ class IncludePackageEntry(EntryBase):
 
   Currently does not support import or export (other than .entry).
   """
+  __slots__ = ()
+
   def read_from(self, stream, isManifest=False, version=7):
     self.name = stream.read_string()
   
@@ -673,6 +854,8 @@ class SpineEntry(EntryBase):
 
   Currently does not support import or export (other than .entry).
   """
+  __slots__ = ('version', 'spineAtlas', 'spineData')
+
   def read_from(self, stream, isManifest=False, version=7):
     self.version = ord(stream.read(1))
     self.name = stream.read_string()
@@ -691,6 +874,6 @@ class SpineEntry(EntryBase):
     super().extract(target, **kwargs)
 
   def _extraction_path(self, target):
-    return os.path.join(target, 'spines', self.name.split('\\')[-1])
+    return os.path.join(target, 'spines', self.short_name())
 
 
@@ -1,13 +1,19 @@
 import io
 import os
 import fnmatch
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 from .compression import get_chunkprocessor, get_chunkprocessor_by_name, validate_compressor_name
-from .utils import IOExtensionMixin as _IOExtensionMixin, FileIO as _FileIO, BytesIO as _BytesIO
+from .utils import IOExtensionMixin as _IOExtensionMixin, FileIO as _FileIO, BytesIO as _BytesIO, BufferedReader as _BufferedReader
+from .utils import _INT_STRUCTS, _SINGLE_STRUCT
 from .entries import get_entry, import_entry
 
 #region Constants
 CHUNK_SIZE = 0x2000000              # The size of uncompressed chunks in packages
+READ_BUFFER_SIZE = 0x100000         # The size of the buffer used when reading package files
+COMPRESSION_WORKERS = min(4, os.cpu_count() or 1)   # Threads (and so chunks in flight) used to compress chunks when writing
+PREFETCH_CHUNKS = True              # Whether readers decompress the next chunk in the background while the current one is read
 
 PACKAGE_VERSION_HADES = 7
 PACKAGE_VERSION_TRANSISTOR = 5
@@ -16,6 +22,8 @@ PACKAGE_VERSIONS = [PACKAGE_VERSION_HADES, PACKAGE_VERSION_PYRE, PACKAGE_VERSION
 
 ENTRY_CODE_END_OF_CHUNK = b'\xBE'
 ENTRY_CODE_END_OF_FILE = b'\xFF'
+_END_OF_CHUNK = ENTRY_CODE_END_OF_CHUNK[0]   # The same codes as ints, as they're compared against when reading
+_END_OF_FILE = ENTRY_CODE_END_OF_FILE[0]
 #endregion
 
 class PackageIO(io.IOBase, _IOExtensionMixin):
@@ -31,7 +39,7 @@ class PackageIO(io.IOBase, _IOExtensionMixin):
   """
 
   #region Basic Functionality
-  def __init__(self, name, mode='r', closefd=True, opener=None, compressor='uncompressed', version=PACKAGE_VERSION_HADES, is_manifest=False):
+  def __init__(self, name, mode='r', closefd=True, opener=None, compressor='uncompressed', version=PACKAGE_VERSION_HADES, is_manifest=False, compressor_level=0):
     """Creates an instance of PackageIO, opening a stream to read the package.
     
     The name, mode, closefd, and opener properties match those from io.open.
@@ -41,17 +49,34 @@ class PackageIO(io.IOBase, _IOExtensionMixin):
     values are 'uncompressed', 'lz4' and 'lzf'. LZ4 and LZF compression require the
     lz4 and lzf modules, respectively.
 
+    The compressor_level property is the compression level to use when writing, for
+    compressors that support one. 0 (the default) selects the fastest mode; for LZ4,
+    levels 1-12 select the slower high-compression mode, which produces smaller packages.
+
     The version property indicates the version number of the package. The PACKAGE_VERSION_*
     constants provide the correct values for this property
     """
     if not mode in ['r', 'w', 'x']:
       raise ValueError(f'invalid mode: {mode}. Only modes r, w, and x are supported')
     self.mode = mode + 'b'
+    # The compressor may be given by name, or by its byte code (e.g. as read from another package's header).
+    # Readers replace this with the processor named in the package header once it's read. This is done
+    # before opening the file, so that e.g. an invalid compression level doesn't leave an empty package behind.
+    if isinstance(compressor, bytes):
+      self.chunkprocessor = get_chunkprocessor(compressor, compressor_level)
+    else:
+      self.chunkprocessor = get_chunkprocessor_by_name(compressor, compressor_level)
     self.raw = _FileIO(name, mode, closefd, opener)
+    if mode == 'r':
+      # Chunk headers are read a few bytes at a time, so buffer reads rather than going to the OS for each
+      self.raw = _BufferedReader(self.raw, READ_BUFFER_SIZE)
     self.virtual_pos = [0, 0]   # Chunk num and position within chunk
+    # File offsets of the chunks found so far. Compressed chunks vary in size, so the offset of
+    # a chunk is only known once the header of the chunk before it has been read; this list is
+    # filled in as chunks are read or skipped, and makes seeking back to a known chunk O(1).
     self.chunklocs = [4]
     self.compressor = compressor
-    self.chunkprocessor = None
+    self.compressor_level = compressor_level
     self.version = version
     self.is_manifest = is_manifest
 
@@ -74,14 +99,6 @@ class PackageIO(io.IOBase, _IOExtensionMixin):
       raise ValueError("flush on closed file")
     self.raw.flush()
 
-  def _get_chunkprocessor(self):
-    if not self.chunkprocessor:
-      if len(self.compressor) == 1:
-        self.chunkprocessor = get_chunkprocessor(self.compressor)
-      else:
-        self.chunkprocessor = get_chunkprocessor_by_name(self.compressor)
-    return self.chunkprocessor
-            
   def isatty(self):
     return self.raw.fileno()
 
@@ -199,7 +216,7 @@ class PackageIO(io.IOBase, _IOExtensionMixin):
     chunksize = CHUNK_SIZE - pos if pos <= 4 else CHUNK_SIZE
 
     # Skip the next chunk from the file using the correct chunk processor
-    self._get_chunkprocessor().skip_chunk(self.raw, chunksize)
+    self.chunkprocessor.skip_chunk(self.raw, chunksize)
     self.virtual_pos[0] += 1
     
     # If we haven't already, add a chunk marker indicating where the next chunk begins
@@ -234,6 +251,16 @@ class PackageReader(PackageIO):
   def __init__(self, name, closefd=True, opener=None, is_manifest=False):
     super().__init__(name, 'r', closefd, opener, is_manifest=is_manifest)
 
+    # Optionally, a function taking an entry name that returns whether that entry's payload
+    # (e.g. texture data) is needed. Entries that support it skip over unneeded payloads.
+    self.payload_filter = None
+
+    # The next chunk is read ahead and decompressed on a background thread (created when first needed)
+    # while the current one is being used. _prefetch is (file position of the chunk, file position after
+    # it, future returning its data), or None if nothing has been read ahead.
+    self._prefetch_pool = None
+    self._prefetch = None
+
     # Initialize the read buffer
     self._reset_read_buf()
 
@@ -242,6 +269,15 @@ class PackageReader(PackageIO):
   #endregion
 
   #region Basic Functionality Overrides
+  def close(self):
+    try:
+      super().close()
+    finally:
+      self._prefetch = None
+      if getattr(self, '_prefetch_pool', None) is not None:
+        self._prefetch_pool.shutdown()
+        self._prefetch_pool = None
+
   def is_eof(self):
     # if the file is eof and there's nothing left in the read buffer, we're EOF
     return self.raw.is_eof() and self._read_pos >= len(self._read_buf)
@@ -270,6 +306,15 @@ class PackageReader(PackageIO):
     if size <= num_bytes_to_read:
       return self._read_from_buffer(size)
 
+    # If nothing is left in this chunk and the next one can satisfy the read, just read from that.
+    # This is the usual case (e.g. reading the first entry of a chunk) and doesn't need to join anything.
+    if num_bytes_to_read == 0:
+      if self._read_chunk() is None:
+        return b""
+      if size <= len(self._read_buf):
+        return self._read_from_buffer(size)
+      num_bytes_to_read = len(self._read_buf)
+
     # Otherwise, we'll need to load at least one more chunk 
     # to load the requested amount of bytes
     data = [self._read_buf[self._read_pos:]]
@@ -291,6 +336,57 @@ class PackageReader(PackageIO):
 
     return b"".join(data)
 
+  def read_int(self, byteorder='big', signed=True):
+    """Reads a four-byte integer.
+
+    Unpacks straight from the read buffer rather than slicing the bytes out first,
+    unless the integer runs past the end of the current chunk.
+    """
+    pos = self._read_pos
+    if pos + 4 <= len(self._read_buf):
+      self._read_pos = pos + 4
+      self.virtual_pos[1] += 4
+      return _INT_STRUCTS[byteorder, signed].unpack_from(self._read_buf, pos)[0]
+    return super().read_int(byteorder, signed)
+
+  def read_single(self):
+    """Reads a single-floating-point number, straight from the read buffer if possible (see read_int)."""
+    pos = self._read_pos
+    if pos + 4 <= len(self._read_buf):
+      self._read_pos = pos + 4
+      self.virtual_pos[1] += 4
+      return _SINGLE_STRUCT.unpack_from(self._read_buf, pos)[0]
+    return super().read_single()
+
+  def read_7bit_encoded_int(self):
+    """Reads a 7-bit-encoded number.
+
+    Decodes straight from the read buffer rather than reading a byte at a time,
+    unless the number runs past the end of the current chunk.
+    """
+    buf = self._read_buf
+    pos = self._read_pos
+    result = 0
+    shift = 0
+    while pos < len(buf):
+      byte_value = buf[pos]
+      pos += 1
+      result |= (byte_value & 0x7f) << shift
+      shift += 7
+      if byte_value & 0x80 == 0:
+        self.virtual_pos[1] += pos - self._read_pos
+        self._read_pos = pos
+        return result
+    return super().read_7bit_encoded_int()
+
+  def skip(self, size):
+    """Advances past the next specified bytes of data without returning them."""
+    if size <= len(self._read_buf) - self._read_pos:
+      self._read_pos += size
+      self.virtual_pos[1] += size
+    else:
+      self.read(size)
+
   def read_entry(self):
     """Reads the next entry from the package.
 
@@ -305,22 +401,31 @@ class PackageReader(PackageIO):
     The object returned will either be None or an instance of a subclass
     of EntryBase.
     """
-    if self.is_eof():
-      return None
-
-    # The first byte tells us what type of entry this is, or signals a special case
-    entry_type = self.read(1)
-
-    if entry_type == ENTRY_CODE_END_OF_CHUNK:
-      # Handle end of chunk and try reading again
-      self._end_of_chunk()
-      return self.read_entry()    
-    elif entry_type == ENTRY_CODE_END_OF_FILE:
-      # Nothing further to do, return None
-      return None
-    else:
-      # Instantiate correct entry type and use this stream to read its data
-      return get_entry(entry_type, self, self.is_manifest)
+    while True:
+      if self.is_eof():
+        return None
+
+      # The first byte tells us what type of entry this is, or signals a special case. It's almost
+      # always in the current chunk, in which case take it straight from the buffer.
+      if self._read_pos < len(self._read_buf):
+        entry_type = self._read_buf[self._read_pos]
+        self._read_pos += 1
+        self.virtual_pos[1] += 1
+      else:
+        entry_type = self.read(1)
+        if not entry_type:
+          return None
+        entry_type = entry_type[0]
+
+      if entry_type == _END_OF_CHUNK:
+        # Handle end of chunk and try reading again
+        self._end_of_chunk()
+      elif entry_type == _END_OF_FILE:
+        # Nothing further to do, return None
+        return None
+      else:
+        # Instantiate correct entry type and use this stream to read its data
+        return get_entry(entry_type, self, self.is_manifest)
 
   def __next__(self):
     """Reads the next entry from the package.
@@ -351,16 +456,17 @@ class PackageReader(PackageIO):
     if (self.raw.tell() != 0):
         raise ValueError("attempted to read header while not at start of file")
 
+    header = self.raw.read(4)
+
     # The first byte of the header indicates the compression method of the package, if any
-    self.compressor = self.raw.read(1)
-    self._get_chunkprocessor()
+    self.compressor = header[0:1]
+    self.chunkprocessor = get_chunkprocessor(self.compressor)
 
     # The next two bytes are zeroes and don't matter
-    self.raw.read(2)
 
     # The fourth (last) byte of the header indicates the package version, which should be
     # 5 for Transistor/Pyte and 7 for Hades
-    self.version = ord(self.raw.read(1))
+    self.version = header[3]
 
     # Update the virtual position to indicate we're at position 4
     self.virtual_pos[1] = 4
@@ -379,12 +485,36 @@ class PackageReader(PackageIO):
     pos = self.raw.tell()   # This should be 4 exactly for the first chunk
     chunksize = CHUNK_SIZE - pos if pos <= 4 else CHUNK_SIZE
 
-    # Read the next chunk from the file using the correct chunk processor
-    self._read_buf = self._get_chunkprocessor().read_chunk(self.raw, chunksize)
+    # Read the next chunk from the file using the correct chunk processor, unless it's already been read ahead
+    prefetch = self._prefetch
+    self._prefetch = None
+    if prefetch is not None and prefetch[0] == pos:
+      self._read_buf = prefetch[2].result()
+      self.raw.seek(prefetch[1], os.SEEK_SET)
+    else:
+      self._read_buf = self.chunkprocessor.read_chunk(self.raw, chunksize)
     self._read_pos = 0
     self.virtual_pos[1] = 0
 
+    self._prefetch_chunk()
     return self._read_buf
+
+  def _prefetch_chunk(self):
+    # Read the next chunk's (compressed) data and decompress it on a background thread. The file is then
+    # put back where it was, so nothing else sees a difference. If the reader ends up somewhere else
+    # (e.g. after a seek), _read_chunk won't find a match and the prefetched chunk is just dropped.
+    processor = self.chunkprocessor
+    if not PREFETCH_CHUNKS or not hasattr(processor, 'read_chunk_deferred') or self.raw.is_eof():
+      return
+
+    pos = self.raw.tell()
+    decompress = processor.read_chunk_deferred(self.raw, CHUNK_SIZE)   # Only the first chunk is smaller
+    endpos = self.raw.tell()
+    self.raw.seek(pos, os.SEEK_SET)
+
+    if self._prefetch_pool is None:
+      self._prefetch_pool = ThreadPoolExecutor(max_workers=1)
+    self._prefetch = (pos, endpos, self._prefetch_pool.submit(decompress))
   
   def _read_from_buffer(self, amt):
     # Advance position by amt and read that many bytes
@@ -392,6 +522,18 @@ class PackageReader(PackageIO):
     self._read_pos += amt
     self.virtual_pos[1] += amt
     return data
+
+  def read_raw_chunk(self, n):
+    """Returns chunk n (0-indexed) exactly as it is stored in the package file, e.g. still compressed.
+
+    The reader must already have moved past chunk n, so that it knows where the chunk ends.
+    The position of the stream is unaffected.
+    """
+    pos = self.raw.tell()
+    self.raw.seek(self.chunklocs[n], os.SEEK_SET)
+    data = self.raw.read(self.chunklocs[n+1] - self.chunklocs[n])
+    self.raw.seek(pos, os.SEEK_SET)
+    return data
   #endregion
 
   #region Random Access
@@ -445,10 +587,17 @@ class PackageReader(PackageIO):
 
 class PackageWriter(PackageIO):
   #region Constructor
-  def __init__(self, name, closefd=True, opener=None, compressor='uncompressed', version=PACKAGE_VERSION_HADES, is_manifest=False):
-    super().__init__(name, 'w', closefd, opener, compressor, version, is_manifest)
+  def __init__(self, name, closefd=True, opener=None, compressor='uncompressed', version=PACKAGE_VERSION_HADES, is_manifest=False, compressor_level=0):
+    super().__init__(name, 'w', closefd, opener, compressor, version, is_manifest, compressor_level)
 
-    # Initialize the write buffer
+    # Chunks are compressed on a thread pool (created when first needed) and written out in order
+    self._compress_pool = None
+    self._pending_chunks = deque()
+
+    # Initialize the write buffer. Chunks are built up in a zero-filled bytearray, with
+    # _write_pos marking how much of it has been written.
+    self._write_buf = None
+    self._write_pos = 0
     self._reset_write_buf()
 
     # Write the header (based on compressor and version)
@@ -457,8 +606,14 @@ class PackageWriter(PackageIO):
 
   #region Basic Functionality Overrides
   def close(self):
-    self._write_chunk(closing=True)
-    super().close()
+    if self.closed:
+      return
+    try:
+      self._write_chunk(closing=True)
+    finally:
+      if self._compress_pool is not None:
+        self._compress_pool.shutdown()
+      super().close()
   #endregion
 
   #region Write Access
@@ -468,33 +623,40 @@ class PackageWriter(PackageIO):
       raise OSError(f'cannot write more than {CHUNK_SIZE} bytes at once')
 
     # Check space in this chunk
-    availspace = len(self._write_buf.getvalue()) - self._write_buf.tell() - 1     # Why -1? Need room for end chunk byte
-    if len(b) > availspace:
-      # No more room in the chunk, write the buffer out, which will allocate a new one
+    size = len(b)
+    availspace = len(self._write_buf) - self._write_pos - 1     # Why -1? Need room for end chunk byte
+    if size > availspace:
+      # No more room in the chunk, write the buffer out, which will reset it for the next one
       self._write_chunk()
 
-    # Write the bytes to the current chunk (may or may not have just been made)
-    self._write_buf.write(b) 
-    self.virtual_pos[1] += len(b)
+    # Copy the bytes into the current chunk (may or may not have just been made)
+    pos = self._write_pos
+    self._write_buf[pos:pos+size] = b
+    self._write_pos = pos + size
+    self.virtual_pos[1] += size
 
   def _write_header(self):
     # If we're not at the start of the file, why are we writing a header?
     if (self.raw.tell() != 0):
       raise ValueError("attempted to write header while not at start of file")
 
-    # The first byte of the header indicates the compression method of the package, if any
-    self.raw.write(self._get_chunkprocessor()._typeCode)
-
-    # The next two bytes are zeroes and don't matter
-    self.raw.write(bytes([0, 0]))
-
-    # The fourth (last) byte of the header indicates the package version
-    self.raw.write(bytes([self.version]))
+    # The first byte of the header indicates the compression method of the package, if any,
+    # the next two bytes are zeroes and don't matter, and the fourth (last) byte indicates
+    # the package version
+    self.raw.write(self.chunkprocessor._typeCode + bytes([0, 0, self.version]))
 
     # Update the virtual position to indicate we're at position 4
     self.virtual_pos[1] = 4
 
   def write_entry(self, entry):
+    # If we know the entry will fit in the current chunk, it can be written straight into the
+    # chunk buffer: none of its writes will cause the chunk to be written out partway through
+    size = entry.size_hint()
+    if size is not None and len(entry.typeCode) + size <= len(self._write_buf) - self._write_pos - 1:
+      self.write(entry.typeCode)
+      entry.write_to(self)
+      return
+
     # Write the entry's bytes to a temporary stream to figure out what the bytes are
     entrystream = _BytesIO()
     entrystream.write(entry.typeCode)
@@ -503,20 +665,61 @@ class PackageWriter(PackageIO):
     # Write the entry's bytes to the "actual" stream
     self.write(entrystream.getvalue())
 
+  def write_raw_chunk(self, data):
+    """Writes a chunk returned by PackageReader.read_raw_chunk to the package as-is.
+
+    The chunk must come from a package using the same compressor, and must not be the first
+    chunk of that package (which is smaller than the rest to make room for the header). Anything
+    written to the current chunk so far is written out as its own chunk first.
+    """
+    if self.virtual_pos[0] == 0 or self.virtual_pos[1] > 0:
+      self._write_chunk()
+
+    # Chunks still being compressed come before this one
+    self._write_pending_chunks(0)
+    self.raw.write(data)
+
+    self.virtual_pos[0] += 1
+    self._reset_write_buf()
+
   def _write_chunk(self, closing=False):
     # Write end-of-chunk or end-of-file
     endbyte = ENTRY_CODE_END_OF_FILE if closing else ENTRY_CODE_END_OF_CHUNK
-    self._write_buf.write(endbyte)
+    self._write_buf[self._write_pos] = endbyte[0]
+    self._write_pos += 1
 
     # If we're writing compressed, we need to write the whole chunk. But if not, we can strip off the extra null bytes.
-    chunk = ""
+    chunk = None
     if self.compressor != 'uncompressed':
-      chunk = self._write_buf.getvalue()
+      chunk = self._write_buf
     else:
-      chunk = self._write_buf.getvalue()[:self._write_buf.tell()]
-
-    # Write the current chunk to the file
-    self._get_chunkprocessor().write_chunk(self.raw, chunk)
+      chunk = memoryview(self._write_buf)[:self._write_pos]
+
+    # Write the current chunk to the file. If the chunk needs compressing, do that on a worker
+    # thread so we can carry on filling the next chunk in the meantime.
+    processor = self.chunkprocessor
+    compressing = None
+    if hasattr(processor, 'compress') and not closing:
+      if self._compress_pool is None:
+        self._compress_pool = ThreadPoolExecutor(max_workers=COMPRESSION_WORKERS)
+      try:
+        compressing = self._compress_pool.submit(processor.compress, chunk)
+      except RuntimeError:
+        # The pool takes no new work once the interpreter is shutting down (e.g. when a writer
+        # that was never closed is finalized then), so compress this chunk here instead
+        pass
+
+    if compressing is not None:
+      self._pending_chunks.append(compressing)
+      self._write_pending_chunks(COMPRESSION_WORKERS)
+
+      # The buffer now belongs to the compression thread, so the next chunk needs a new one
+      self._write_buf = None
+    else:
+      # Chunks still being compressed come before this one. The last chunk is always written
+      # here, so closing the package never depends on the pool.
+      self._write_pending_chunks(0)
+      processor.write_chunk(self.raw, chunk)
 
     # Reset the write buffer to a blank state
     self._reset_write_buf()
@@ -525,9 +728,21 @@ class PackageWriter(PackageIO):
     self.virtual_pos[0] += 1
     self.virtual_pos[1] = 0
 
+  def _write_pending_chunks(self, max_pending):
+    # Write compressed chunks out (in order) until at most max_pending are left in flight
+    while len(self._pending_chunks) > max_pending:
+      compressedData = self._pending_chunks.popleft().result()
+      self.chunkprocessor.write_compressed_chunk(self.raw, compressedData)
+
   def _reset_write_buf(self):
+    # Reuse the buffer if it's already been written out, clearing only the part that was used.
+    # Otherwise (e.g. it's been handed off to be compressed), allocate a new one.
     chunksize = CHUNK_SIZE - 4 if self.virtual_pos[0] == 0 else CHUNK_SIZE
-    self._write_buf = _BytesIO(bytes(chunksize))
+    if self._write_buf is not None and len(self._write_buf) == chunksize:
+      self._write_buf[:self._write_pos] = bytes(self._write_pos)
+    else:
+      self._write_buf = bytearray(chunksize)
+    self._write_pos = 0
   #endregion
 
   #region Random Access (disabled)
@@ -556,69 +771,47 @@ class PackageWithManifestReader(PackageReader):
     return entry
 
 class PackageWithManifestWriter(PackageWriter):
-  def __init__(self, name, closefd=True, opener=None, compressor='uncompressed', version=PACKAGE_VERSION_HADES):
-    super().__init__(name, closefd, opener, compressor, version)
+  def __init__(self, name, closefd=True, opener=None, compressor='uncompressed', version=PACKAGE_VERSION_HADES, compressor_level=0):
+    super().__init__(name, closefd, opener, compressor, version, compressor_level=compressor_level)
     manifest_name = f'{name}_manifest'
     self.manifest = PackageWriter(manifest_name, closefd, opener, version=version, is_manifest=True)
 
   def write_entry_with_manifest(self, entry):
     self.write_entry(entry)
-    if self.manifest is not None and hasattr(entry, 'manifest_entry'):
+    if self.manifest is not None and getattr(entry, 'manifest_entry', None) is not None:
       self.manifest.write_entry(entry.manifest_entry)
 
+  def write_raw_chunk_with_manifest(self, data, entries):
+    """Writes a chunk returned by PackageReader.read_raw_chunk, plus the manifest entries of the entries in it."""
+    self.write_raw_chunk(data)
+    for entry in entries:
+      if self.manifest is not None and getattr(entry, 'manifest_entry', None) is not None:
+        self.manifest.write_entry(entry.manifest_entry)
+
   def close(self):
     super().close()
     self.manifest.close()
 
 def patch(name, *patches, logger=lambda s : None):
-  # Rename existing package/manifest so we can edit in place
-  package_old_path = f'{name}.old'
-  os.replace(name, package_old_path)
-  manifest_path = f'{name}_manifest'
-  manifest_old_path = f'{package_old_path}_manifest'
-  os.replace(manifest_path, manifest_old_path)
-
-  # Get the entries to replace in the package from the patches
-  patch_entries = {}
-  for patch in patches:
-    for entry in PackageWithManifestReader(patch):
-      patch_entries[entry.name] = entry
-
-  # Open the old package for reading and a new package for writing
-  with PackageWithManifestReader(package_old_path) as source, PackageWithManifestWriter(name, compressor=source.compressor, version=source.version) as target:
-    # Scan source package, replacing entries with the patched versions if present
-    for entry in source:
-      if entry.name in patch_entries:
-        # Write the entry from the patches
-        logger(f'Applying patch to entry {entry.name}')
-        target.write_entry_with_manifest(patch_entries.pop(entry.name))
-      else:
-        # No matching entry in patches, so just write the original entry
-        logger(f'No patch for entry {entry.name}, using original entry')
-        target.write_entry_with_manifest(entry)
-
-    # Append any entries in patches that weren't in the source
-    for entry in patch_entries.values():
-      logger(f'Appending entry {entry.name}')
-      target.write_entry_with_manifest(entry)
-        
-  # Delete the old files
-  os.remove(package_old_path)
-  os.remove(manifest_old_path)
+  """Patches the package given by name with the given patches. This is the same as deppth.patch."""
+  from .deppth import patch as _patch
+  _patch(name, *patches, logger=logger)
 
 def load_package(name):
   """Loads the entire contents of the package given by name and returns an array of entries."""
   is_manifest = name.endswith('_manifest')
   return PackageReader.load_package(name, is_manifest)
 
-def open_package(name, mode, closefd=True, opener=None, compressor='lz4', version=PACKAGE_VERSION_HADES):
+def open_package(name, mode, closefd=True, opener=None, compressor='lz4', version=PACKAGE_VERSION_HADES, compressor_level=0):
   """Opens the package with base filename given by name. 
   
   mode - Valid modes are 'r', 'w', 'rm', and 'wm'. R for Read, W for Write, M for include Manifest.
   closefd, opener - Similar to the same parameters on os.open
 
   These parameters are only used for writing; if reading the values are inferred from the package data:
-  compressor - Compression to use on the package. Valid values are 'uncompressed', 'lz4', and 'lzf'
+  compressor - Compression to use on the package. Valid values are 'uncompressed', 'lz4', 'lz4hc', and 'lzf'.
+    'lz4hc' writes LZ4 packages (readable like any other) using the high-compression mode at level 9
+  compressor_level - Compression level. 0 is fastest (or the compressor's default); 1-12 use LZ4's slower high-compression mode
   version - Should be a PACKAGE_VERSION_* constant depending on the game (7 if Hades, 5 otherwise)
   """
   if not validate_compressor_name(compressor):
@@ -630,10 +823,10 @@ def open_package(name, mode, closefd=True, opener=None, compressor='lz4', versio
   if mode == 'r':
     return PackageReader(name, closefd=closefd, opener=opener)
   elif mode == 'w':
-    return PackageWriter(name, closefd=closefd, opener=opener, compressor=compressor, version=version)
+    return PackageWriter(name, closefd=closefd, opener=opener, compressor=compressor, version=version, compressor_level=compressor_level)
   elif mode == 'rm':
     return PackageWithManifestReader(name, closefd=closefd, opener=opener)
   elif mode == 'wm':
-    return PackageWithManifestWriter(name, closefd=closefd, opener=opener, compressor=compressor, version=version)
+    return PackageWithManifestWriter(name, closefd=closefd, opener=opener, compressor=compressor, version=version, compressor_level=compressor_level)
   else:
     raise ValueError(f'Invalid mode: {mode}')
\ No newline at end of file
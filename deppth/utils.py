@@ -3,6 +3,15 @@ import os
 import struct
 import io
 
+# Precompiled structs for the fixed-size values streams read and write, so the formats aren't parsed on every call
+_INT_STRUCTS = {
+  ('big', True): struct.Struct('>i'),
+  ('big', False): struct.Struct('>I'),
+  ('little', True): struct.Struct('<i'),
+  ('little', False): struct.Struct('<I')
+}
+_SINGLE_STRUCT = struct.Struct('>f')
+
 def requires(moduleName):
     """Marks a function as requiring an optional module dependency."""
     def decorate_function(fn):
@@ -54,21 +63,31 @@ class IOExtensionMixin():
 
   def read_int(self, byteorder='big', signed=True):
     """Reads a four-byte integer."""
-    return int.from_bytes(self.read(4), byteorder=byteorder, signed=signed)
+    return _INT_STRUCTS[byteorder, signed].unpack(self.read(4))[0]
 
   def write_int(self, n, byteorder='big', signed=True):
     """Writes a four-byte integer."""
-    intBytes = n.to_bytes(4, byteorder, signed=signed)
+    intBytes = _INT_STRUCTS[byteorder, signed].pack(n)
     self.write(intBytes)
 
+  def read_ints(self, n, byteorder='big', signed=True):
+    """Reads n four-byte integers, returning them as a tuple."""
+    fmt = ('>' if byteorder == 'big' else '<') + str(n) + ('i' if signed else 'I')
+    return struct.unpack(fmt, self.read(4 * n))
+
+  def write_ints(self, ns, byteorder='big', signed=True):
+    """Writes a sequence of four-byte integers."""
+    fmt = ('>' if byteorder == 'big' else '<') + str(len(ns)) + ('i' if signed else 'I')
+    self.write(struct.pack(fmt, *ns))
+
   def read_single(self):
     """Reads a single-floating-point number."""
     singleBytes = self.read(4)
-    return struct.unpack('>f', singleBytes)[0]
+    return _SINGLE_STRUCT.unpack(singleBytes)[0]
 
   def write_single(self, s):
     """Writes a single-floating-point number."""
-    singleBytes = struct.pack('>f', s)
+    singleBytes = _SINGLE_STRUCT.pack(s)
     self.write(singleBytes)
 
   def read_7bit_encoded_int(self):
@@ -125,9 +144,27 @@ class IOExtensionMixin():
 
 class BytesIO(io.BytesIO, IOExtensionMixin):
     """An enhanced version of BytesIO that includes additional functions."""
-    pass
+    def is_eof(self):
+      """Returns whether the stream is at EOF."""
+      # Compare against the end of the buffer rather than reading a byte and seeking back
+      pos = self.tell()
+      end = self.seek(0, os.SEEK_END)
+      self.seek(pos, os.SEEK_SET)
+      return pos >= end
 
 
 class FileIO(io.FileIO, IOExtensionMixin):
     """An enhanced version of FileIO that includes additonal functions."""
-    pass
\ No newline at end of file
+    pass
+
+
+class BufferedReader(io.BufferedReader, IOExtensionMixin):
+    """An enhanced version of BufferedReader that includes additional functions."""
+    def __init__(self, raw, buffer_size=io.DEFAULT_BUFFER_SIZE):
+      super().__init__(raw, buffer_size)
+      # The file is only being read, so its size is looked up once for is_eof
+      self._size = os.fstat(raw.fileno()).st_size
+
+    def is_eof(self):
+      """Returns whether the stream is at EOF."""
+      return self.tell() >= self._size